@@ -24,12 +24,37 @@
 # SOFTWARE.
 
 from copy import deepcopy
+import threading
 import numpy as np
 """The element type of numpy arrays in the .data property of all nodes throughout the framework."""
 dtype = np.float32
 
 """Framework version"""
-version = '1.4.2'
+version = '1.5.0'
+
+"""Random generator used by nodes evaluated outside of an FFN (see FFN.rng and generator)."""
+rng = np.random.default_rng()
+
+_local = threading.local()
+
+
+def generator():
+    """Get the random generator nodes should draw from.
+
+    :return: the rng of the FFN being evaluated in the current thread or, if none, the module's rng.
+    """
+    return getattr(_local, 'rng', None) or rng
+
+
+def streams(seed, n):
+    """Create independent, reproducible random generators, i.e. one per data parallel worker.
+
+    :param seed: int: seed from which all generators are derived.
+    :param n: number of generators.
+
+    :return: a list of np.random.Generator.
+    """
+    return [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(n)]
 
 
 class NetVar:
@@ -45,9 +70,15 @@ class NetVar:
     Whether a variable is optimized as a learnable parameter of a network depends on derivatives
     for it being computed and it being passed to an optimizer's list of parameters.
 
+    Variables are slotted (no per-instance __dict__) since a new set of nodes is created
+    on every forward pass and graphs can easily contain thousands of them.
+
     Attributes:
     . g: the gradient of a network's implemented function w.r.t. the variable.
+    . hooks: functions called when g is final during backprop (see hook).
     """
+    __slots__ = ('g', '_data', 'hooks', '__weakref__')
+
     def __init__(self, data=None):
         """Create a variable, optionally initializing it to a value.
 
@@ -56,11 +87,26 @@ class NetVar:
 
         A variable's data also determines the shape of its g property.
         """
-        self.g, self._data = None, None
+        self.g, self._data, self.hooks = None, None, None
 
         if data is not None:
             self.data = data
 
+    def hook(self, fn):
+        """Register a function to call as soon as this variable's gradient is final during backprop.
+
+        That is, once every operator taking the variable as an input has backpropagated to it,
+        even if backprop hasn't finished for the rest of the network (i.e.: to start updating a
+        parameter early, see Optimizer.overlap). Only variables which are not operators are hooked.
+
+        :param fn: function taking this variable as its only argument.
+        """
+        self.hooks = (self.hooks or []) + [fn]
+
+    def unhook(self, fn):
+        """Unregister a function registered with hook."""
+        self.hooks = [h for h in self.hooks or [] if h != fn] or None
+
     @property
     def data(self):
         """Return this variable's value.
@@ -75,10 +121,13 @@ class NetVar:
 
         Setting a variable's value implies resetting its g property.
 
-        :param data: a list or numpy array.
+        :param data: a list, numpy array or CSR matrix (see sparse.CSR).
+        Sparse values are kept as is, and have no g property.
         """
         if data is None:
             self._data = None
+        elif isinstance(data, CSR):
+            self._data = data
         else:
             # Make data into a ndarray if it is not already:
             self._data = self._data = np.array(
@@ -88,15 +137,73 @@ class NetVar:
         self.reset()
 
     def reset(self):
-        """Reset this variable's g property."""
-        if self.data is None:
+        """Reset this variable's g property.
+
+        A row sparse g (see RowSparse) stays row sparse.
+        """
+        if self.data is None or isinstance(self._data, CSR):
             self.g = None
+        elif isinstance(self.g, RowSparse):
+            self.g = RowSparse(self._data.shape)
         else:
-            self.g = np.zeros_like(
-                self._data, dtype=dtype
+            # np.zeros (unlike np.zeros_like) gets zeroed memory from the OS lazily, so
+            # gradients which are never written to (i.e. during inference) cost next to nothing:
+            self.g = np.zeros(
+                self._data.shape, dtype=dtype
             )
 
 
+class RowSparse:
+    """Row sparse gradient.
+
+    Gradient of a 2D variable (i.e. an embedding table) where only a few rows are nonzero.
+    Holds a list of (rows, values) contributions which are only summed when the gradient is consumed,
+    so its cost is proportional to the number of rows touched instead of the size of the variable.
+
+    Optimizers update only the touched rows of parameters with row sparse gradients.
+
+    Attributes:
+    . shape: the shape of the dense equivalent of this gradient.
+    . rows: list of integer arrays of row indices, one for each contribution.
+    . values: list of arrays of size (|rows|, shape[1]), one for each contribution.
+    """
+    __slots__ = ('shape', 'rows', 'values')
+
+    def __init__(self, shape):
+        self.shape = shape
+        self.rows, self.values = [], []
+
+    def add(self, rows, values):
+        """Accumulate values into rows. Rows may repeat.
+
+        :param rows: integer array of row indices.
+        :param values: array of size (|rows|, shape[1]).
+        """
+        self.rows.append(rows)
+        self.values.append(values)
+
+    def coalesce(self):
+        """Sum all contributions to each row.
+
+        :return: a tuple of sorted unique row indices and an array of their summed values.
+        """
+        if not self.rows:
+            return np.empty(0, np.intp), np.empty((0, self.shape[1]), dtype)
+
+        rows, values = np.concatenate(self.rows), np.concatenate(self.values)
+        order = np.argsort(rows, kind='stable')
+        rows, values = rows[order], values[order]
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        return rows[starts], np.add.reduceat(values, starts, axis=0)
+
+    def toarray(self):
+        """Return the dense equivalent of this gradient."""
+        dense = np.zeros(self.shape, dtype)
+        rows, values = self.coalesce()
+        dense[rows] = values
+        return dense
+
+
 class NetOp(NetVar):
     """Base class for network nodes implementing an operation.
 
@@ -106,9 +213,20 @@ class NetOp(NetVar):
     the network) and their values are the result of applying transformations on
     those inputs. They also provide the entry point to backpropagation of gradients thru chain rule.
 
+    Like variables, operators are slotted. Subclasses should declare __slots__ too, or
+    they silently get a per-instance __dict__ back. The cache slot is available to any
+    operator for data needed in its backprop pass. Operators needing additional attributes
+    should list them in their own __slots__, i.e.:
+
+        class MyOp(NetOp):
+            __slots__ = ('extra',)
+
     Attributes:
     . parents: this node's parents.
+    . cache: optional data saved during the forward pass for use in the backprop pass.
     """
+    __slots__ = ('parents', 'cache')
+
     def __init__(self, data, *parents):
         """Create an operator and compute its forward pass.
 
@@ -125,12 +243,32 @@ class NetOp(NetVar):
         """
         super().__init__(data)
         self.parents = parents
+        self.cache = None
 
     def back(self):
         """Backpropagate gradients through the network."""
         # Base case: gradient of operator with respect to itself is 1:
         self.g = np.ones_like(self.data, dtype)
-        self._back(*self.parents)
+        previous, _local.pending = getattr(_local, 'pending', None), self._pending()
+
+        try:
+            self._back(*self.parents)
+        finally:
+            _local.pending = previous
+
+    def _pending(self):
+        # Count how many times backprop will reach each hooked variable, by mirroring the
+        # recursion in _back, which reaches each operator once per path from this one:
+        pending, stack = {}, [self]
+
+        while stack:
+            for p in stack.pop().parents:
+                if isinstance(p, NetOp):
+                    stack.append(p)
+                elif p.hooks:
+                    pending[p] = pending.get(p, 0) + 1
+
+        return pending
 
     def _back(self, *parents):
         # Compute this node's gradient w.r.t its parents.
@@ -143,6 +281,18 @@ class NetOp(NetVar):
         #
         # :param parents: the parents of this node. Subclasses can use this
         # as is or explicitly enumerate parents in their implementation signature.
+        pending = getattr(_local, 'pending', None)
+
+        if pending:
+            for p in self.parents:
+                if p in pending:
+                    pending[p] -= 1
+
+                    if not pending[p]:
+                        del pending[p]
+                        for hook in p.hooks:
+                            hook(p)
+
         for p in [p for p in self.parents if isinstance(p, NetOp)]:
             p._back(*p.parents)
 
@@ -153,8 +303,10 @@ class FFN:
     Attributes:
     . topology: a list of tuples descriping each layer in the network (see __init__).
     . layers: a list of instantiated operators in the network, recreated on each forward pass (see __init__).
+    . rng: np.random.Generator used by stochastic nodes (i.e.: Dropout) during the forward pass.
+    . prefix: optional cache of the outputs of a frozen prefix of the topology (see caching.PrefixCache).
     """
-    def __init__(self, *topology):
+    def __init__(self, *topology, rng=None):
         """Creates a feed forward network with an initial topology.
 
         :param topology: a list of tuples describing each layer in the network. Each layer will have as its
@@ -170,15 +322,23 @@ class FFN:
 
         Each time the net's forward pass executes, the net also recreates its layers property, which is a list
         of instantiated operators for that pass.
+
+        :param rng: optional np.random.Generator for stochastic nodes. For data parallel training, give
+        each worker's network its own generator (see streams), or deep copy a network, which spawns
+        an independent generator for the copy. Defaults to a new unseeded generator.
         """
         self.topology = list(topology)
         self.layers = []
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.prefix = None
 
     def __deepcopy__(self, memodict={}):
+        # Copies get an independent generator spawned from this one, so i.e. worker copies of a
+        # network draw different (but reproducible) dropout masks:
         return type(self)(*[
             [NetVar(np.copy(n.data)) if type(n) is NetVar else n if type(n) is type else deepcopy(n) for n in layer]
             for layer in self.topology
-        ])
+        ], rng=self.rng.spawn(1)[0])
 
     @property
     def vars(self):
@@ -195,20 +355,55 @@ class FFN:
             if type(p) is NetVar
         ]
 
-    def __call__(self, x):
+    def __call__(self, x, ids=None):
         """Evaluate an input by executing the network's forward pass.
 
         :param x: input to the network.
+        :param ids: optional ids of each sample in x. If given and the network has a prefix cache,
+        the prefix's outputs are taken from the cache, and layers and backprop only cover the rest of the topology.
 
         :return: the value of the last node in the network. This is usually
         the networks prediction but could also be the network loss if the last
         node in the network is a loss node (i.e.: during training).
         """
         self.layers.clear()
+        topology = self.topology
+
+        if self.prefix is not None and ids is not None:
+            x = NetVar(self.prefix(x.data if isinstance(x, NetVar) else x, ids))
+            topology = topology[self.prefix.n:]
+
+        previous, _local.rng = getattr(_local, 'rng', None), self.rng
+
+        try:
+            for n in topology:
+                x = n[0](x, *n[1:])
+                self.layers.append(x)
+        finally:
+            _local.rng = previous
+
+        return x.data
+
+    def predict(self, x):
+        """Evaluate an input in inference mode, without modifying the network.
+
+        Unlike the call operator, this does not record layers, and evaluates the topology without
+        training only nodes and with BatchNorm nodes using averaged values (see inference.freeze).
+        Parameters are only read, and any intermediate buffers are per thread, so a single network
+        can serve predictions from multiple threads concurrently, as long as it is not trained meanwhile.
+
+        :param x: NetVar or array: input to the network. Integer arrays are passed as is (see Embedding).
+
+        :return: the value of the last node in the network.
+        """
+        # Imported here because of circular dependencies:
+        from .inference import freeze
+
+        if not isinstance(x, NetVar) and not (isinstance(x, np.ndarray) and x.dtype.kind in 'iu'):
+            x = NetVar(x)
 
-        for n in self.topology:
+        for n in freeze(self.topology, fold=False):
             x = n[0](x, *n[1:])
-            self.layers.append(x)
 
         return x.data
 
@@ -221,13 +416,21 @@ class FFN:
 # Import all other modules so one can access them by importing just nnkit
 # (imported here because of circular dependencies):
 
+from .sparse import *
 from .initialization import *
 from .regularization import *
 from .normalization import *
 from .optimization import *
 from .activation import *
 from .arithmetic import *
+from .convolution import *
+from .recurrent import *
 from .loss import *
+from .inference import *
+from .quantization import *
+from .pruning import *
+from .evaluation import *
+from .caching import *
 
 # This one needs access to all others, which is why is last in the import list:
 from .serialization import *
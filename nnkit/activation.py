@@ -25,6 +25,19 @@
 
 import numpy as np
 from . import NetOp
+from . import kernels
+
+"""Activations can optionally be computed in place, overwriting the value of their input instead of
+allocating a new array. This is only safe when no other node needs the value of the input afterwards,
+including for backprop. This is the case for instance if the input is a Multiply, Add or BatchNorm node
+consumed only by the activation, but not if it is another activation or a network input.
+
+All activations compute their backprop pass from their own value, not their input's.
+"""
+
+
+def _out(x, inplace):
+    return x.data if inplace else np.empty_like(x.data)
 
 
 class ReLU(NetOp):
@@ -32,17 +45,20 @@ class ReLU(NetOp):
 
     y = max(0, x)
     """
-    def __init__(self, x):
+    __slots__ = ()
+
+    def __init__(self, x, inplace=False):
         """
         :param x: NetVar: input.
+        :param inplace: whether to overwrite x's value with the result.
         """
         super().__init__(
-            np.maximum(0, x.data),
+            kernels.relu(x.data, _out(x, inplace)),
             x
         )
 
     def _back(self, x):
-        x.g += np.where(x.data > 0, self.g, 0)
+        kernels.reluBack(self.data, self.g, x.g)
         super()._back()
 
 
@@ -51,13 +67,16 @@ class LReLU(NetOp):
 
     y = max(sx, x)
     """
-    def __init__(self, x, s=0.01):
+    __slots__ = ()
+
+    def __init__(self, x, s=0.01, inplace=False):
         """
         :param x: NetVar: input.
         :param s: negative slope.
+        :param inplace: whether to overwrite x's value with the result.
         """
         super().__init__(
-            np.maximum(s * x.data, x.data),
+            kernels.lrelu(x.data, s, _out(x, inplace)),
             x
         )
 
@@ -65,7 +84,7 @@ class LReLU(NetOp):
 
     def _back(self, x):
         s = self.cache
-        x.g += np.where(x.data > 0, self.g, s)
+        kernels.lreluBack(self.data, self.g, s, x.g)
         super()._back()
 
 
@@ -74,17 +93,20 @@ class Sigmoid(NetOp):
 
     y = 1/(1+e^-x)
     """
-    def __init__(self, x):
+    __slots__ = ()
+
+    def __init__(self, x, inplace=False):
         """
         :param x: NetVar: input.
+        :param inplace: whether to overwrite x's value with the result.
         """
         super().__init__(
-            1. / (1. + np.exp(-x.data)),
+            kernels.sigmoid(x.data, _out(x, inplace)),
             x
         )
 
     def _back(self, x):
-        x.g += self.g * self.data * (1. - self.data)
+        kernels.sigmoidBack(self.data, self.g, x.g)
         super()._back()
 
 
@@ -93,18 +115,20 @@ class Tanh(NetOp):
 
     y = (e^x - e^-x)/(e^x + e^-x)
     """
-    def __init__(self, x):
+    __slots__ = ()
+
+    def __init__(self, x, inplace=False):
         """
         :param x: NetVar: input.
+        :param inplace: whether to overwrite x's value with the result.
         """
-        ex, _ex = np.exp(x.data), np.exp(-x.data)
         super().__init__(
-            (ex - _ex) / (ex + _ex),
+            kernels.tanh(x.data, _out(x, inplace)),
             x
         )
 
     def _back(self, x):
-        x.g += self.g * (1. - self.data ** 2)
+        kernels.tanhBack(self.data, self.g, x.g)
         super()._back()
 
 
@@ -113,21 +137,19 @@ class Softmax(NetOp):
 
     y = e^x_i/∑{X}:e^{x_j}, ∀x_i in X:
     """
-    def __init__(self, x):
+    __slots__ = ()
+
+    def __init__(self, x, inplace=False):
         """
         :param x: NetVar: input.
+        :param inplace: whether to overwrite x's value with the result.
         """
-
-        # For numerical stability. See: http://cs231n.github.io/linear-classify/#softmax
-        ex = np.exp(x.data - np.max(x.data, axis=1, keepdims=True))
-
         super().__init__(
-            ex / np.sum(ex, axis=1, keepdims=True),
+            kernels.softmax(x.data, _out(x, inplace)),
             x
         )
 
     def _back(self, x):
-        x.g += self.g * self.data * (1. - self.data)
+        # Elementwise derivative y(1-y), same as the sigmoid:
+        kernels.sigmoidBack(self.data, self.g, x.g)
         super()._back()
-
-
@@ -24,14 +24,32 @@
 # SOFTWARE.
 
 import numpy as np
-from . import NetOp
+from . import NetOp, RowSparse
+from .sparse import CSR
+
+
+def _addRows(w, rows, values):
+    # Accumulate values into rows of w.g, keeping w.g row sparse (see RowSparse) when possible.
+    if isinstance(w.g, RowSparse):
+        w.g.add(rows, values)
+    elif not w.g.any():
+        # First backprop into a freshly reset variable: switch to a row sparse gradient.
+        w.g = RowSparse(w.data.shape)
+        w.g.add(rows, values)
+    else:
+        np.add.at(w.g, rows, values)
 
 
 class Multiply(NetOp):
     """Multiplication.
 
     y = xw
+
+    x can be sparse (see sparse.CSR), in which case its gradient is not computed and the gradient
+    w.r.t. w is row sparse (see RowSparse), with one row for each column of x holding values.
     """
+    __slots__ = ()
+
     def __init__(self, x, w):
         """
         :param x: NetVar: input 1.
@@ -44,8 +62,16 @@ class Multiply(NetOp):
         )
 
     def _back(self, x, w):
-        x.g += self.g @ w.data.T
-        w.g += x.data.T @ self.g
+        if isinstance(x.data, CSR):
+            _addRows(w, x.data.indices, x.data.data[:, None] * self.g[x.data.rows()])
+        else:
+            x.g += self.g @ w.data.T
+
+            if isinstance(w.g, RowSparse):
+                w.g = w.g.toarray()
+
+            w.g += x.data.T @ self.g
+
         super()._back()
 
 
@@ -53,7 +79,11 @@ class Add(NetOp):
     """Addition.
 
     y = x+b
+
+    b is broadcast over all but the last dimension of x.
     """
+    __slots__ = ()
+
     def __init__(self, x, b):
         """
         :param x: NetVar: input 1.
@@ -66,5 +96,57 @@ class Add(NetOp):
 
     def _back(self, x, b):
         x.g += self.g
-        b.g += np.sum(self.g, axis=0)
+        b.g += np.sum(self.g, axis=tuple(range(self.g.ndim - 1)))
+        super()._back()
+
+
+class Embedding(NetOp):
+    """Embedding lookup.
+
+    y = w[x]
+
+    Equivalent to multiplying a one-hot encoding of x by w, but in time proportional to the
+    number of indices in x instead of the number of rows in w.
+
+    Gradients w.r.t. w are row sparse (see RowSparse), so optimizers only update the rows
+    used in a pass. An embedding table should therefore not be shared with dense operators.
+    """
+    __slots__ = ()
+
+    def __init__(self, x, w):
+        """
+        :param x: integer numpy array or NetVar: row indices into w, of any shape.
+        NetVar values are dtype, which can't represent every index above 2^24 exactly,
+        so indices into larger tables must be given as an integer array (which can be
+        passed as is to FFN and FFN.predict, if this is the first layer).
+        :param w: NetVar: size (rows, dim): embedding table.
+
+        The result has size x.shape + (dim,). Use Flatten to concatenate the
+        embeddings of each sample.
+        """
+        if isinstance(x, np.ndarray):
+            if x.dtype.kind not in 'iu':
+                raise TypeError('Embedding indices must be integers, not {}'.format(x.dtype))
+
+            idx, parents = x.astype(np.intp, copy=False), (w,)
+        else:
+            if len(w.data) > 2 ** (np.finfo(x.data.dtype).nmant + 1):
+                raise ValueError(
+                    'A table of {} rows needs integer indices, {} can not represent all of them'.format(
+                        len(w.data), x.data.dtype
+                    )
+                )
+
+            idx, parents = x.data.astype(np.intp), (x, w)
+
+        super().__init__(
+            w.data[idx],
+            *parents
+        )
+
+        self.cache = idx
+
+    def _back(self, *parents):
+        w, idx = parents[-1], self.cache
+        _addRows(w, idx.ravel(), self.g.reshape(-1, w.data.shape[1]))
         super()._back()
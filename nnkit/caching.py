@@ -0,0 +1,122 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2018 Federico Saldarini
+# https://www.linkedin.com/in/federicosaldarini
+# https://github.com/saldavonschwartz
+# https://0xfede.io
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from collections import OrderedDict
+import numpy as np
+from . import FFN, dtype
+
+
+class PrefixCache:
+    """Cache of the outputs of a frozen prefix of a network, by sample.
+
+    When fine tuning only the last layers of a network, the outputs of the first (frozen) layers
+    never change for a given sample. Setting a PrefixCache as a network's prefix (see FFN.prefix)
+    makes the network evaluate the prefix only once per sample, and backprop only through the
+    remaining layers. The optimizer should then only be given the parameters of the remaining layers.
+
+    The prefix is evaluated in inference mode (see FFN.predict), so its outputs are deterministic.
+
+    Outputs are cached either in memory, for up to size samples, evicting the least recently used
+    ones; or in a memory mapped file, for all samples.
+
+    Attributes:
+    . net: the network whose prefix is cached.
+    . n: number of layers in the prefix.
+    """
+    def __init__(self, net, n, size=None, path=None, samples=None):
+        """
+        :param net: FFN: the network whose prefix to cache.
+        :param n: number of layers in the prefix (i.e.: net.topology[:n]).
+        :param size: maximum number of samples cached in memory. If None, there is no limit.
+        :param path: optional path of a file to cache outputs in, instead of memory.
+        :param samples: number of samples in the dataset. Required if path is given.
+        """
+        if path is not None and samples is None:
+            raise ValueError('samples is required to cache to a file')
+
+        self.net, self.n = net, n
+        self.size, self.path, self.samples = size, path, samples
+        self._memory = OrderedDict()
+        self._file, self._cached = None, None
+
+    def __call__(self, x, ids):
+        """Get the prefix outputs for a batch of samples, evaluating only samples not yet cached.
+
+        :param x: array: batch of samples.
+        :param ids: integer ids identifying each sample in the batch (i.e.: their indices in the dataset).
+
+        :return: array of prefix outputs for the batch.
+        """
+        ids = np.asarray(ids, np.intp).ravel()
+
+        if self.path is None:
+            return self._fromMemory(x, ids)
+
+        return self._fromFile(x, ids)
+
+    def clear(self):
+        """Discard all cached outputs, i.e. if the prefix's parameters change."""
+        self._memory.clear()
+
+        if self._cached is not None:
+            self._cached[:] = False
+
+    def _evaluate(self, x):
+        return FFN(*self.net.topology[:self.n]).predict(x)
+
+    def _fromMemory(self, x, ids):
+        missing = [j for j, i in enumerate(ids) if i not in self._memory]
+
+        if missing:
+            y = self._evaluate(x[missing])
+            for j, row in zip(missing, y):
+                self._memory[ids[j]] = row.copy()
+
+        rows = []
+        for i in ids:
+            self._memory.move_to_end(i)
+            rows.append(self._memory[i])
+
+        # Evict least recently used samples, but never the ones in this batch:
+        while self.size is not None and len(self._memory) > max(self.size, len(ids)):
+            self._memory.popitem(last=False)
+
+        return np.stack(rows)
+
+    def _fromFile(self, x, ids):
+        cached = self._cached[ids] if self._cached is not None else np.zeros(len(ids), bool)
+        missing = np.flatnonzero(~cached)
+
+        if len(missing):
+            y = self._evaluate(x[missing])
+
+            if self._file is None:
+                self._file = np.memmap(self.path, dtype, mode='w+', shape=(self.samples,) + y.shape[1:])
+                self._cached = np.zeros(self.samples, bool)
+
+            self._file[ids[missing]] = y
+            self._cached[ids[missing]] = True
+
+        return np.asarray(self._file[ids])
@@ -0,0 +1,228 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2018 Federico Saldarini
+# https://www.linkedin.com/in/federicosaldarini
+# https://github.com/saldavonschwartz
+# https://0xfede.io
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+from . import NetOp
+from .kernels import buffer, acquire
+
+"""Convolution and pooling operators.
+
+All operators in this module take inputs in NHWC layout: (batch, height, width, channels),
+and are implemented in terms of im2col / col2im on strided views of their (padded) input.
+
+Intermediate buffers (padded inputs, im2col columns, etc.) are reused across forward passes
+with the same shape instead of being reallocated on every pass. Buffers which must survive
+until the backprop pass belong to the node using them (see kernels.acquire), while scratch buffers
+only used within a single forward or backprop computation are shared by all layers (see kernels.buffer).
+"""
+
+def _outSize(size, k, s, p):
+    return (size + 2 * p - k) // s + 1
+
+
+def _pad(x, p, fill=0.):
+    """Copy x into a reusable buffer with a border of p elements along height and width."""
+    if p == 0:
+        return x
+
+    b, h, w, c = x.shape
+    xPadded = buffer('pad{}'.format(fill), (b, h + 2 * p, w + 2 * p, c), fill=fill)
+    xPadded[:, p:p + h, p:p + w, :] = x
+    return xPadded
+
+
+def _windows(x, k, s, oh, ow):
+    """Return a (batch, oh, ow, k, k, channels) view of all k x k windows in x, without copying."""
+    sb, sh, sw, sc = x.strides
+    return as_strided(
+        x, shape=(x.shape[0], oh, ow, k, k, x.shape[3]),
+        strides=(sb, sh * s, sw * s, sh, sw, sc),
+        writeable=False
+    )
+
+
+def _col2im(cols, shape, k, s, p):
+    """Scatter-add (batch, oh, ow, k, k, channels) windows back into an array of the given (unpadded) shape."""
+    b, h, w, c = shape
+    oh, ow = cols.shape[1:3]
+    dx = buffer('col2im', (b, h + 2 * p, w + 2 * p, c))
+    dx.fill(0.)
+
+    for i in range(k):
+        for j in range(k):
+            dx[:, i:i + s * oh:s, j:j + s * ow:s, :] += cols[:, :, :, i, j, :]
+
+    return dx[:, p:p + h, p:p + w, :]
+
+
+class Conv2D(NetOp):
+    """2D convolution (cross-correlation).
+
+    y[b,i,j,:] = ∑{k,k,C}:x[b, i*s+m, j*s+n, c] * w[m,n,c,:]
+
+    Where:
+    . x: input of shape (batch, height, width, C).
+    . w: filters of shape (k*k*C, filters), with rows ordered by (m, n, c).
+    . s: stride.
+
+    Filters are stored as a 2D matrix so they can be created with any of the
+    initializers in the initialization module, i.e.: xavier(k*k*C, filters).
+    A bias can be added by following this layer with an Add layer of shape (1, filters).
+    """
+    __slots__ = ()
+
+    def __init__(self, x, w, k, s=1, p=0):
+        """
+        :param x: NetVar: input.
+        :param w: NetVar: filters.
+        :param k: filter height and width.
+        :param s: stride.
+        :param p: zero padding along height and width.
+        """
+        b, h, wd, c = x.data.shape
+        oh, ow = _outSize(h, k, s, p), _outSize(wd, k, s, p)
+
+        cols = acquire(self, (b * oh * ow, k * k * c))
+        np.copyto(cols.reshape(b, oh, ow, k, k, c), _windows(_pad(x.data, p), k, s, oh, ow))
+
+        super().__init__(
+            (cols @ w.data).reshape(b, oh, ow, -1),
+            x, w
+        )
+
+        self.cache = cols, k, s, p
+
+    def _back(self, x, w):
+        cols, k, s, p = self.cache
+        b, oh, ow, f = self.g.shape
+        g = self.g.reshape(-1, f)
+        w.g += cols.T @ g
+
+        dCols = np.matmul(g, w.data.T, out=buffer('dCols', cols.shape))
+        x.g += _col2im(dCols.reshape(b, oh, ow, k, k, -1), x.data.shape, k, s, p)
+        super()._back()
+
+
+class MaxPool2D(NetOp):
+    """2D max pooling.
+
+    y[b,i,j,c] = max{k,k}:x[b, i*s+m, j*s+n, c]
+
+    Where:
+    . x: input of shape (batch, height, width, channels).
+    . s: stride.
+    """
+    __slots__ = ()
+
+    def __init__(self, x, k=2, s=None, p=0):
+        """
+        :param x: NetVar: input.
+        :param k: window height and width.
+        :param s: stride. Defaults to k (non overlapping windows).
+        :param p: padding along height and width. Padded elements are never selected.
+        """
+        s = s or k
+        b, h, w, c = x.data.shape
+        oh, ow = _outSize(h, k, s, p), _outSize(w, k, s, p)
+
+        cols = buffer('poolCols', (b, oh, ow, k * k, c))
+        np.copyto(cols.reshape(b, oh, ow, k, k, c), _windows(_pad(x.data, p, -np.inf), k, s, oh, ow))
+        idx = np.argmax(cols, axis=3)[:, :, :, None, :]
+
+        super().__init__(
+            np.take_along_axis(cols, idx, axis=3)[:, :, :, 0, :],
+            x
+        )
+
+        self.cache = idx, k, s, p
+
+    def _back(self, x):
+        idx, k, s, p = self.cache
+        b, oh, ow, c = self.g.shape
+
+        dCols = buffer('poolCols', (b, oh, ow, k * k, c))
+        dCols.fill(0.)
+        np.put_along_axis(dCols, idx, self.g[:, :, :, None, :], axis=3)
+        x.g += _col2im(dCols.reshape(b, oh, ow, k, k, c), x.data.shape, k, s, p)
+        super()._back()
+
+
+class AvgPool2D(NetOp):
+    """2D average pooling.
+
+    y[b,i,j,c] = 1/k^2 * ∑{k,k}:x[b, i*s+m, j*s+n, c]
+
+    Where:
+    . x: input of shape (batch, height, width, channels).
+    . s: stride.
+    """
+    __slots__ = ()
+
+    def __init__(self, x, k=2, s=None, p=0):
+        """
+        :param x: NetVar: input.
+        :param k: window height and width.
+        :param s: stride. Defaults to k (non overlapping windows).
+        :param p: zero padding along height and width.
+        """
+        s = s or k
+        b, h, w, c = x.data.shape
+        oh, ow = _outSize(h, k, s, p), _outSize(w, k, s, p)
+
+        super().__init__(
+            np.mean(_windows(_pad(x.data, p), k, s, oh, ow), axis=(3, 4)),
+            x
+        )
+
+        self.cache = k, s, p
+
+    def _back(self, x):
+        k, s, p = self.cache
+        b, oh, ow, c = self.g.shape
+        dCols = np.broadcast_to((self.g / (k * k))[:, :, :, None, None, :], (b, oh, ow, k, k, c))
+        x.g += _col2im(dCols, x.data.shape, k, s, p)
+        super()._back()
+
+
+class Flatten(NetOp):
+    """Flatten all but the batch dimension.
+
+    Used to connect convolution or pooling layers to fully connected (i.e.: Multiply) layers.
+    """
+    __slots__ = ()
+
+    def __init__(self, x):
+        """
+        :param x: NetVar: input.
+        """
+        super().__init__(
+            x.data.reshape(len(x.data), -1),
+            x
+        )
+
+    def _back(self, x):
+        x.g += self.g.reshape(x.data.shape)
+        super()._back()
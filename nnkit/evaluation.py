@@ -0,0 +1,96 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2018 Federico Saldarini
+# https://www.linkedin.com/in/federicosaldarini
+# https://github.com/saldavonschwartz
+# https://0xfede.io
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import numpy as np
+from . import NetVar
+
+"""Metrics for evaluate.
+
+A metric takes a batch of predictions and targets and returns the sum (not the mean) of its value
+over the batch, so it can be accumulated over batches of any size. Targets can be either one-hot
+encoded or, for classification metrics, a single column of class indices.
+"""
+
+
+def _classes(t):
+    return t[:, 0].astype(np.intp) if t.shape[1] == 1 else np.argmax(t, axis=1)
+
+
+def accuracy(p, t):
+    """Number of predictions whose highest scoring class is the target class."""
+    return np.sum(np.argmax(p, axis=1) == _classes(t))
+
+
+def topk(k):
+    """Create a metric counting predictions with the target class among their k highest scoring classes."""
+    def metric(p, t):
+        top = np.argpartition(p, -k, axis=1)[:, -k:]
+        return np.sum(top == _classes(t)[:, None])
+
+    metric.__name__ = 'top{}'.format(k)
+    return metric
+
+
+def mae(p, t):
+    """Sum over samples of the mean absolute error over features."""
+    return np.sum(np.mean(np.abs(p - t), axis=1))
+
+
+def evaluate(net, x, t, loss=None, metrics=(), batchSize=256):
+    """Evaluate a network over a dataset in batches, in inference mode.
+
+    Memory usage only depends on the batch size: batches are sliced from x and t as they are
+    evaluated and neither predictions nor the network's intermediate values are kept across batches.
+    x and t can therefore also be memory mapped arrays (i.e.: np.memmap) larger than memory.
+
+    The network is evaluated with FFN.predict, so it is not modified.
+
+    :param net: FFN: the network to evaluate. Its topology should not contain a loss node.
+    :param x: input samples.
+    :param t: targets for each sample. Class indices can also be given as a 1D array.
+    :param loss: optional loss node class (i.e.: L2Loss).
+    :param metrics: metric functions (i.e.: accuracy, topk(5), mae).
+    :param batchSize: number of samples evaluated at once.
+
+    :return: a dict with the average of the loss (under 'loss') and each metric (under its name) over all samples.
+    """
+    if len(x) == 0:
+        raise ValueError('cannot evaluate an empty dataset')
+
+    totals = dict.fromkeys(([] if loss is None else ['loss']) + [m.__name__ for m in metrics], 0.)
+
+    for i in range(0, len(x), batchSize):
+        tb = np.asarray(t[i:i + batchSize])
+        tb = NetVar(tb.reshape(-1, 1) if tb.ndim == 1 else tb)
+        p = net.predict(x[i:i + batchSize])
+        n = len(p)
+
+        if loss is not None:
+            totals['loss'] += loss(NetVar(p), tb).data.item() * n
+
+        for m in metrics:
+            totals[m.__name__] += float(m(p, tb.data))
+
+    return {k: v / len(x) for k, v in totals.items()}
@@ -0,0 +1,91 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2018 Federico Saldarini
+# https://www.linkedin.com/in/federicosaldarini
+# https://github.com/saldavonschwartz
+# https://0xfede.io
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import numpy as np
+from . import NetVar
+from .arithmetic import Multiply, Add
+from .normalization import BatchNorm
+from .regularization import L2Reg, Dropout
+from .loss import L1Loss, L2Loss, CELoss, HuberLoss
+
+"""Nodes which are only meaningful during training and are removed by freeze."""
+trainingOnly = (L2Reg, Dropout, L1Loss, L2Loss, CELoss, HuberLoss)
+
+
+def freeze(topology, remove=(), fold=True):
+    """Create an inference only topology from a trained one.
+
+    The resulting topology:
+    . Does not contain training only nodes (see trainingOnly).
+    . Has BatchNorm nodes folded into a directly preceding Multiply (and optionally Add)
+    layer, using their averaged mean and variance. BatchNorm nodes which cannot be folded
+    (i.e. after a Conv2D, where statistics are per position rather than per filter) are
+    kept, but set to use averaged values.
+
+    All variables are copies, so the original topology can keep being trained, and the
+    result can be passed to FFN or serialization.save.
+
+    :param topology: list of tuples describing each layer in a network (see FFN).
+    :param remove: additional node classes to remove.
+    :param fold: whether to fold BatchNorm nodes. If False, BatchNorm nodes are only set
+    to use averaged values and variables are shared with topology instead of copied.
+
+    :return: a list of tuples.
+    """
+    frozen = []
+
+    for layer in topology:
+        op = layer[0]
+        args = [NetVar(np.copy(a.data)) if fold and type(a) is NetVar else a for a in layer[1:]]
+
+        if issubclass(op, trainingOnly + tuple(remove)):
+            continue
+
+        if op is not BatchNorm:
+            frozen.append((op, *args))
+            continue
+
+        if not fold:
+            frozen.append((op, *args[:4], True))
+            continue
+
+        # y = (x-μ)/σ * γ + β = x * s + (β - μs), where s = γ/σ:
+        gamma, beta, avgVar, avgMean = args[:4]
+        scale = gamma.data / np.sqrt(avgVar.data + 1e-8)
+        shift = beta.data - avgMean.data * scale
+
+        if len(frozen) > 1 and frozen[-1][0] is Add and frozen[-2][0] is Multiply:
+            # (xw + b) * s + shift = x(ws) + (bs + shift):
+            w, b = frozen[-2][1], frozen[-1][1]
+            w.data = w.data * scale
+            b.data = b.data * scale + shift
+        elif frozen and frozen[-1][0] is Multiply:
+            w = frozen[-1][1]
+            w.data = w.data * scale
+            frozen.append((Add, NetVar(shift)))
+        else:
+            frozen.append((op, *args[:4], True))
+
+    return frozen
@@ -0,0 +1,161 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2018 Federico Saldarini
+# https://www.linkedin.com/in/federicosaldarini
+# https://github.com/saldavonschwartz
+# https://0xfede.io
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import threading
+import weakref
+import numpy as np
+from . import dtype
+
+"""Low level numeric kernels shared by operators.
+
+Kernels write their results into a caller provided out array instead of allocating new ones,
+and draw any temporaries they need from reusable buffers (see buffer and acquire). Backprop kernels
+accumulate into out (i.e. out is usually the g property of an input).
+"""
+
+# Buffers are per thread, so networks can be evaluated concurrently (see FFN.predict):
+_local = threading.local()
+_maxSharedBuffers = 64
+_maxPooledBuffers = 8
+
+
+def buffer(name, shape, fill=None, type=dtype):
+    """Get a scratch buffer which is reused across calls instead of being reallocated.
+
+    Buffers are keyed by name and shape and must only be used within a single computation,
+    since any other computation may overwrite them. To keep data across computations
+    (i.e. from a forward to a backprop pass), use acquire instead.
+
+    Each thread gets its own buffers.
+
+    :param name: buffer identifier.
+    :param shape: buffer shape.
+    :param fill: optional value the buffer is initialized to when allocated. If None, it is uninitialized.
+    :param type: buffer element type.
+
+    :return: a numpy array.
+    """
+    buffers, key = _local.__dict__.setdefault('shared', {}), (name, shape, type)
+    if key not in buffers and len(buffers) >= _maxSharedBuffers:
+        buffers.clear()
+
+    b = buffers.get(key)
+
+    if b is None:
+        b = buffers[key] = np.empty(shape, type) if fill is None else np.full(shape, fill, type)
+
+    return b
+
+
+def acquire(node, shape, type=dtype):
+    """Get an uninitialized buffer for the exclusive use of a node, for as long as the node exists.
+
+    Buffers come from a per thread pool, and are returned to it when the node is garbage collected
+    (i.e. when the network's next forward pass replaces its layers), so they can be reused by
+    nodes created afterwards without ever being shared by two live nodes.
+
+    :param node: NetOp using the buffer.
+    :param shape: buffer shape.
+    :param type: buffer element type.
+
+    :return: a numpy array.
+    """
+    pool = _local.__dict__.setdefault('pool', {})
+    free = pool.get((shape, type))
+    b = free.pop() if free else np.empty(shape, type)
+    weakref.finalize(node, _release, pool, b)
+    return b
+
+
+def _release(pool, b):
+    free = pool.setdefault((b.shape, b.dtype.type), [])
+    if len(free) < _maxPooledBuffers:
+        free.append(b)
+
+
+def relu(x, out):
+    return np.maximum(x, 0., out=out)
+
+
+def reluBack(y, g, out):
+    mask = np.greater(y, 0., out=buffer('mask', y.shape, type=bool))
+    return np.add(out, g, out=out, where=mask)
+
+
+def lrelu(x, s, out):
+    # max(sx, x) for s in [0, 1):
+    mask = np.less(x, 0., out=buffer('mask', x.shape, type=bool))
+    if out is not x:
+        np.copyto(out, x)
+
+    return np.multiply(out, s, out=out, where=mask)
+
+
+def lreluBack(y, g, s, out):
+    mask = np.less_equal(y, 0., out=buffer('mask', y.shape, type=bool))
+    t = buffer('t', g.shape)
+    np.copyto(t, g)
+    np.multiply(t, s, out=t, where=mask)
+    out += t
+    return out
+
+
+def sigmoid(x, out):
+    # σ(x) = (1 + tanh(x/2))/2, which unlike 1/(1+e^-x) never overflows:
+    np.multiply(x, .5, out=out)
+    np.tanh(out, out=out)
+    out += 1.
+    out *= .5
+    return out
+
+
+def sigmoidBack(y, g, out):
+    # dσ = σ(1-σ):
+    t = np.subtract(1., y, out=buffer('t', y.shape))
+    t *= y
+    t *= g
+    out += t
+    return out
+
+
+def tanh(x, out):
+    return np.tanh(x, out=out)
+
+
+def tanhBack(y, g, out):
+    # dtanh = 1 - tanh^2:
+    t = np.multiply(y, y, out=buffer('t', y.shape))
+    np.subtract(1., t, out=t)
+    t *= g
+    out += t
+    return out
+
+
+def softmax(x, out):
+    # Shifted by the max for numerical stability. See: http://cs231n.github.io/linear-classify/#softmax
+    np.subtract(x, np.max(x, axis=1, keepdims=True), out=out)
+    np.exp(out, out=out)
+    out /= np.sum(out, axis=1, keepdims=True)
+    return out
@@ -40,6 +40,8 @@ class L1Loss(NetOp):
     . p: prediction.
     . t: target.
     """
+    __slots__ = ()
+
     def __init__(self, p, t):
         """
         :param p: NetVar: prediction.
@@ -71,6 +73,8 @@ class L2Loss(NetOp):
     . p: prediction.
     . t: target.
     """
+    __slots__ = ()
+
     def __init__(self, p, t):
         """
         :param p: NetVar: prediction.
@@ -100,6 +104,8 @@ class CELoss(NetOp):
     . p: prediction.
     . t: target.
     """
+    __slots__ = ()
+
     def __init__(self, p, t):
         """
         :param p: NetVar: prediction.
@@ -134,6 +140,8 @@ class HuberLoss(NetOp):
     . p: prediction.
     . t: target.
     """
+    __slots__ = ()
+
     def __init__(self, p, t, d=1):
         """
         :param p: NetVar: prediction.
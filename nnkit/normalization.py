@@ -25,6 +25,7 @@
 
 import numpy as np
 from . import NetOp
+from .kernels import buffer
 
 
 class BatchNorm(NetOp):
@@ -39,6 +40,8 @@ class BatchNorm(NetOp):
     . γ: learnable variance.
     . β: learnable mean.
     """
+    __slots__ = ()
+
     def __init__(self, x, gamma, beta, avgVar, avgMean, useAvg):
         """
         :param x: NetVar: input.
@@ -49,39 +52,47 @@ class BatchNorm(NetOp):
         :param useAvg: whether to compute batch mean and variance or use averaged values.
         """
         if useAvg:
-            mean = avgMean.data
+            mean, var = avgMean.data, avgVar.data
+            xNormalized = x.data - mean
         else:
             mean = np.mean(x.data, axis=0)
-            avgMean.data = 0.9 * avgMean.data + 0.1 * mean
+            xNormalized = x.data - mean
 
-        xCenter = x.data - mean
+            # Variance of the centered batch, without materializing xCenter ** 2:
+            var = np.einsum('i...,i...->...', xNormalized, xNormalized) / len(x.data)
 
-        if useAvg:
-            var = avgVar.data
-        else:
-            var = np.mean(xCenter ** 2, axis=0)
-            avgVar.data = 0.9 * avgVar.data + 0.1 * var
+            # Update running averages in place (i.e. not through the data setter, which would reset g):
+            for avg, batch in ((avgMean.data, mean), (avgVar.data, var)):
+                avg *= 0.9
+                avg += 0.1 * batch
 
-        xNormalized = xCenter / np.sqrt(var + 1e-8)
+        invStd = 1. / np.sqrt(var + 1e-8)
+        xNormalized *= invStd
+
+        y = xNormalized * gamma.data
+        y += beta.data
 
         super().__init__(
-            xNormalized * gamma.data + beta.data,
+            y,
             x, gamma, beta
         )
 
-        self.cache = var, xCenter, xNormalized
+        self.cache = invStd, xNormalized
 
     def _back(self, x, gamma, beta):
-        var, xCenter, xNormalized = self.cache
+        invStd, xNormalized = self.cache
+        bSize = len(x.data)
 
-        gamma.g += np.sum(self.g * xNormalized, axis=0)
-        beta.g += np.sum(self.g, axis=0)
+        dGamma = np.einsum('i...,i...->...', self.g, xNormalized)
+        dBeta = np.sum(self.g, axis=0)
+        gamma.g += dGamma
+        beta.g += dBeta
 
-        bSize = len(x.data)
-        t1 = 1/bSize * gamma.data * (var + 1e-8) ** (-1/2)
-        t2 = bSize * self.g
-        t3 = np.sum(self.g, axis=0)
-        t4 = xCenter * (var + 1e-8) ** -1 * np.sum(self.g * xCenter, axis=0)
-        x.g += t1 * (t2 - t3 - t4)
+        # dx = γ/σ_B * (g - 1/B * (∑{B}:g + x̂ * ∑{B}:g*x̂)):
+        t = np.multiply(xNormalized, dGamma / bSize, out=buffer('t', self.g.shape))
+        np.subtract(self.g, t, out=t)
+        t -= dBeta / bSize
+        t *= gamma.data * invStd
+        x.g += t
 
         super()._back()
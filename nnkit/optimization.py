@@ -23,7 +23,9 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+from concurrent.futures import ThreadPoolExecutor, wait
 import numpy as np
+from . import RowSparse
 
 
 class Optimizer:
@@ -39,6 +41,17 @@ class Optimizer:
 
     . vars:
     parameters to adjust during an optimization step.
+
+    . masks:
+    optional dict of boolean arrays by parameter. Masked out (False) components of a
+    parameter are kept at 0 after each optimization step (i.e.: pruned weights, see pruning.prune).
+
+    . weightDecay: λ ≥ 0
+    decoupled weight decay: each step, decayed parameters are also shrunk as p = p - αλp.
+    This replaces an L2Reg node, without extra passes over the parameters.
+
+    . decayed:
+    set of parameters to apply weight decay to. All parameters by default, but usually only weights (i.e. not biases).
     """
     def __init__(self, params):
         """Create a new optimizer for a list of parameters.
@@ -47,13 +60,100 @@ class Optimizer:
         """
         self.learnRate = 0.1
         self.params = params
+        self.masks = {}
+        self.weightDecay = 0.
+        self.decayed = set(params)
+        self._index = {p: i for i, p in enumerate(params)}
+        self._executor, self._updates, self._updated = None, [], set()
 
     def step(self):
         """Do one step of minimization to all parameters.
 
-        Subclasses override this method to implement different minimization techniques.
+        In overlap mode (see overlap), most parameters have already been updated during
+        backprop. This then waits for those updates and updates any remaining parameters.
+        """
+        if self._updates:
+            for update in wait(self._updates).done:
+                update.result()
+
+        for i, p in enumerate(self.params):
+            if p not in self._updated:
+                self._update(i, p)
+
+        self._updates.clear()
+        self._updated.clear()
+
+    def overlap(self, enabled=True, threaded=False):
+        """Enable or disable updating parameters during backprop.
+
+        When enabled, each parameter is updated as soon as its gradient is final (see NetVar.hook),
+        instead of waiting for backprop through the whole network. step must still be called after
+        backprop, and before the next forward pass.
+
+        :param enabled: whether to update parameters during backprop.
+        :param threaded: whether updates run on a worker thread, concurrently with the rest of backprop.
+        Since numpy releases the GIL for most array operations, this shortens each training step further.
         """
-        pass
+        for p in self.params:
+            p.unhook(self._ready)
+
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+        if enabled:
+            for p in self.params:
+                p.hook(self._ready)
+
+            if threaded:
+                self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def _ready(self, p):
+        # Gradient hook in overlap mode:
+        self._updated.add(p)
+
+        if self._executor is None:
+            self._update(self._index[p], p)
+        else:
+            self._updates.append(self._executor.submit(self._update, self._index[p], p))
+
+    def _update(self, i, p):
+        # Update parameter i (p) and reset its gradient.
+        #
+        # Subclasses override this method to implement different minimization techniques.
+        p.reset()
+
+    def penalty(self):
+        """Compute the weight decay penalty, i.e. to add it to a reported loss.
+
+        λ/2 * Σ||p||^2, over decayed parameters.
+
+        This is only needed for reporting, since weight decay is applied directly in each step.
+
+        :return: float.
+        """
+        if not self.weightDecay:
+            return 0.
+
+        return .5 * self.weightDecay * sum(
+            float(np.vdot(p.data, p.data)) for p in self.params if p in self.decayed
+        )
+
+    def _decay(self, p, rows=None):
+        # Apply weight decay to p (or only some rows of it), before updating it:
+        if self.weightDecay and p in self.decayed:
+            f = 1. - self.learnRate * self.weightDecay
+
+            if rows is None:
+                np.multiply(p.data, f, out=p.data)
+            else:
+                p.data[rows] *= f
+
+    def _mask(self, p):
+        # Apply p's mask, if any, after updating it:
+        mask = self.masks.get(p)
+        if mask is not None:
+            np.multiply(p.data, mask, out=p.data)
 
 
 class GD(Optimizer):
@@ -62,7 +162,7 @@ class GD(Optimizer):
     Implements the following update for each parameter p:
 
     m = β1m + (1-β1)df/dp
-    p = p - αm
+    p = p - α(m + λp)
 
     Attributes:
     . learnRate: α ∈ [0,1]
@@ -71,17 +171,31 @@ class GD(Optimizer):
     . momentum: β1 ∈ [0,1)
     over how many samples the exponential moving average m takes place.
     If set to 0 momentum is disabled and the algorithm becomes simply gradient descent.
+
+    Where λ is the optimizer's weightDecay.
+
+    Parameters with row sparse gradients (see RowSparse) are updated lazily: only
+    the rows present in the gradient, along with their moments, are updated (and decayed).
     """
     def __init__(self, params):
         super().__init__(params)
         self.momentum = 0.9
         self.m = [np.zeros_like(p.data) for p in params]
 
-    def step(self):
-        for i, p in enumerate(self.params):
+    def _update(self, i, p):
+        if isinstance(p.g, RowSparse):
+            rows, g = p.g.coalesce()
+            self._decay(p, rows)
+            m = self.m[i]
+            m[rows] = self.momentum * m[rows] + (1 - self.momentum) * g
+            p.data[rows] -= self.learnRate * m[rows]
+        else:
+            self._decay(p)
             self.m[i] = self.momentum * self.m[i] + (1 - self.momentum) * p.g
             p.data -= self.learnRate * self.m[i]
-            p.reset()
+
+        self._mask(p)
+        p.reset()
 
 
 class Adam(GD):
@@ -91,7 +205,7 @@ class Adam(GD):
 
     m = β1m + (1-β1)df/dp
     r = β2r + (1-β2)(df/dp)^2
-    p = p - α m/√(r + 1e-8)
+    p = p - α(m/√(r + 1e-8) + λp)
 
     Attributes:
     . learnRate: α ∈ [0,1]
@@ -103,18 +217,32 @@ class Adam(GD):
 
     . momentum: β2 ∈ [0,1]
     over how many samples the exponential squared moving average r takes place.
+
+    Where λ is the optimizer's weightDecay (i.e.: AdamW).
+
+    Parameters with row sparse gradients are updated lazily, as in GD.
     """
     def __init__(self, params):
         super().__init__(params)
         self.rms = 0.999
         self.r = [np.zeros_like(p.data) for p in params]
 
-    def step(self):
-        for i, p in enumerate(self.params):
+    def _update(self, i, p):
+        if isinstance(p.g, RowSparse):
+            rows, g = p.g.coalesce()
+            self._decay(p, rows)
+            m, r = self.m[i], self.r[i]
+            m[rows] = self.momentum * m[rows] + (1 - self.momentum) * g
+            r[rows] = self.rms * r[rows] + (1 - self.rms) * g**2
+            p.data[rows] -= self.learnRate * (m[rows] / np.sqrt(r[rows] + 1e-8))
+        else:
+            self._decay(p)
             self.m[i] = self.momentum * self.m[i] + (1 - self.momentum) * p.g
             self.r[i] = self.rms * self.r[i] + (1 - self.rms) * p.g**2
             p.data -= self.learnRate * (self.m[i] / np.sqrt(self.r[i] + 1e-8))
-            p.reset()
+
+        self._mask(p)
+        p.reset()
 
 
 
@@ -0,0 +1,144 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2018 Federico Saldarini
+# https://www.linkedin.com/in/federicosaldarini
+# https://github.com/saldavonschwartz
+# https://0xfede.io
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import numpy as np
+from . import NetOp
+from .arithmetic import Multiply
+from .sparse import CSR
+
+"""Magnitude pruning.
+
+Pruning sets the smallest weights in a network to 0. It can be done once after training,
+or gradually during training (see schedule), in which case pruning masks should be given to
+the optimizer (see Optimizer.masks) so pruned weights stay at 0 between pruning steps.
+
+Multiply layers with mostly zero weights can then be replaced by SparseMultiply layers
+(see sparsify), which store and multiply only nonzero weights.
+"""
+
+
+def prune(params, sparsity, scope='layer'):
+    """Set the smallest magnitude weights in a list of parameters to 0.
+
+    :param params: list of NetVars to prune. Usually only weights (i.e. not biases).
+    :param sparsity: [0-1] fraction of weights to prune.
+    :param scope: 'layer' to prune a fraction of each parameter, or 'global' to prune a fraction of
+    all parameters together, by comparing magnitudes across parameters.
+
+    :return: a dict of pruning masks (boolean arrays, True where weights are kept) by parameter.
+    """
+    if scope == 'global':
+        magnitudes = np.concatenate([np.abs(p.data).ravel() for p in params])
+        thresholds = [_threshold(magnitudes, sparsity)] * len(params)
+    elif scope == 'layer':
+        thresholds = [_threshold(np.abs(p.data).ravel(), sparsity) for p in params]
+    else:
+        raise ValueError("scope must be 'layer' or 'global', not {!r}".format(scope))
+
+    masks = {}
+
+    for p, threshold in zip(params, thresholds):
+        masks[p] = np.abs(p.data) > threshold
+        np.multiply(p.data, masks[p], out=p.data)
+
+    return masks
+
+
+def _threshold(magnitudes, sparsity):
+    # Magnitude at and below which weights are pruned:
+    k = int(sparsity * len(magnitudes))
+    if k == 0:
+        return -1.
+
+    return np.partition(magnitudes, k - 1)[k - 1]
+
+
+def schedule(step, sparsity, begin, end, initial=0.):
+    """Sparsity for gradual pruning, increasing from initial to sparsity between steps begin and end.
+
+    s = s_f + (s_i - s_f) * (1 - (t-t_0)/(t_1-t_0))^3
+
+    Pruning is fast early on, when there are many redundant weights, and slows down towards the end.
+
+    :param step: current training step.
+    :param sparsity: final sparsity.
+    :param begin: step at which pruning starts.
+    :param end: step at which the final sparsity is reached.
+    :param initial: sparsity at step begin.
+
+    :return: the sparsity to prune to at step.
+    """
+    progress = min(max((step - begin) / max(end - begin, 1), 0.), 1.)
+    return sparsity + (initial - sparsity) * (1. - progress) ** 3
+
+
+class SparseMultiply(NetOp):
+    """Multiplication by sparse weights.
+
+    y = xw
+
+    The product is computed in time proportional to the number of nonzero weights.
+    This node is meant for inference. Backprop only computes gradients w.r.t. x.
+    """
+    __slots__ = ()
+
+    def __init__(self, x, wT):
+        """
+        :param x: NetVar: input.
+        :param wT: CSR: transposed weights (i.e.: of size (|y columns|, |x columns|)).
+        """
+        super().__init__(
+            wT.dot(x.data.T).T,
+            x
+        )
+
+        self.cache = wT
+
+    def _back(self, x):
+        wT = self.cache
+        x.g += wT.transpose().dot(self.g.T).T
+        super()._back()
+
+
+def sparsify(topology, sparsity=0.5):
+    """Create a topology with sparse Multiply layers replaced by SparseMultiply layers.
+
+    :param topology: list of tuples describing each layer in a network (see FFN).
+    :param sparsity: [0-1] minimum fraction of zero weights for a layer to be replaced.
+    Below a certain sparsity, a dense multiplication is faster.
+
+    :return: a list of tuples.
+    """
+    sparse = []
+
+    for layer in topology:
+        op, args = layer[0], layer[1:]
+
+        if op is Multiply and np.mean(args[0].data == 0) >= sparsity:
+            sparse.append((SparseMultiply, CSR.fromDense(args[0].data.T)))
+        else:
+            sparse.append(layer)
+
+    return sparse
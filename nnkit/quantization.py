@@ -0,0 +1,162 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2018 Federico Saldarini
+# https://www.linkedin.com/in/federicosaldarini
+# https://github.com/saldavonschwartz
+# https://0xfede.io
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import numpy as np
+from . import NetVar, NetOp, dtype
+from .arithmetic import Multiply
+from .inference import freeze
+from .kernels import buffer
+
+"""Post-training int8 quantization.
+
+Weights are quantized symmetrically per output column (channel): w ≈ q * s, with q ∈ [-127, 127].
+Quantized weights and scales are plain numpy arrays instead of NetVars, since they are not
+learnable and NetVars always hold dtype values. serialization.save stores them as raw bytes.
+"""
+
+
+# Rows of q converted to dtype at a time. Products of int8 values are below 2^14, so sums of
+# up to 1024 of them are below 2^24 and exact in float32:
+_chunk = 1024
+
+
+def _quantize(x, scale, type=np.int8):
+    return np.clip(np.rint(x / scale), -127, 127).astype(type)
+
+
+def _scale(absMax):
+    # Avoid division by zero for all zero columns / activations:
+    return (np.maximum(absMax, 1e-8) / 127.).astype(dtype)
+
+
+class QMultiply(NetOp):
+    """Multiplication by int8 quantized weights.
+
+    y = x(q*s)
+
+    Where:
+    . q: int8 weights.
+    . s: per column scales of q.
+
+    If an activation scale s_x is given, x is also quantized and the product accumulated in integers:
+
+    y = (q_x q) * s_x * s, where q_x = round(x/s_x).
+
+    This node is meant for inference. Backprop only computes gradients w.r.t. x.
+    """
+    __slots__ = ()
+
+    def __init__(self, x, q, s, sx=None):
+        """
+        :param x: NetVar: input.
+        :param q: int8 numpy array: quantized weights.
+        :param s: numpy array of size (1, |q columns|): weight scales.
+        :param sx: optional float: activation scale. If None, x is not quantized.
+        """
+        if sx is None:
+            y = _matmul(x.data, q, False)
+        else:
+            y = _matmul(_quantize(x.data, sx, dtype), q, True)
+            y *= sx
+
+        y *= s
+
+        super().__init__(
+            y,
+            x
+        )
+
+        self.cache = q, s
+
+    def _back(self, x):
+        q, s = self.cache
+        g = self.g * s
+
+        for i, qi in _chunks(q):
+            x.g[:, i:i + len(qi)] += g @ qi.T
+
+        super()._back()
+
+
+def _chunks(q):
+    # Yield (row offset, rows) of q converted to dtype, so products go through BLAS without
+    # converting all of q on every call:
+    for i in range(0, len(q), _chunk):
+        qi = buffer('qmultiply', (min(_chunk, len(q) - i), q.shape[1]))
+        qi[...] = q[i:i + _chunk]
+        yield i, qi
+
+
+def _matmul(x, q, exact):
+    # x @ q, accumulated in int32 across chunks if exact (x and q integer valued):
+    if len(q) <= _chunk:
+        return x @ next(_chunks(q))[1]
+
+    y = np.zeros((len(x), q.shape[1]), np.int32 if exact else dtype)
+
+    for i, qi in _chunks(q):
+        np.add(y, x[:, i:i + len(qi)] @ qi, out=y, casting='unsafe')
+
+    return y.astype(dtype, copy=False)
+
+
+def quantize(topology, x=None):
+    """Create a topology with all Multiply weights quantized to int8.
+
+    Calibration evaluates the topology like FFN.predict (see inference.freeze): training only
+    nodes are skipped and BatchNorm nodes use (and don't update) their averaged values.
+
+    :param topology: list of tuples describing each layer in a network (see FFN).
+    :param x: optional calibration batch (NetVar or array). If given, the inputs to each Multiply are
+    quantized too, with a scale derived from their largest absolute value over the batch.
+
+    :return: a list of tuples, with Multiply layers replaced by QMultiply layers.
+    """
+    quantized, scales = [], []
+
+    if x is not None:
+        if not isinstance(x, NetVar) and not (isinstance(x, np.ndarray) and x.dtype.kind in 'iu'):
+            x = NetVar(x)
+
+        # freeze removes no Multiply layers, so scales are in the same order as in topology:
+        for op, *args in freeze(topology, fold=False):
+            if op is Multiply:
+                scales.append(float(_scale(np.max(np.abs(x.data)))))
+
+            x = op(x, *args)
+
+    scales = iter(scales)
+
+    for layer in topology:
+        op, args = layer[0], layer[1:]
+
+        if op is Multiply:
+            w = args[0].data
+            s = _scale(np.max(np.abs(w), axis=0, keepdims=True))
+            quantized.append((QMultiply, _quantize(w, s), s, next(scales, None)))
+        else:
+            quantized.append(layer)
+
+    return quantized
@@ -0,0 +1,256 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2018 Federico Saldarini
+# https://www.linkedin.com/in/federicosaldarini
+# https://github.com/saldavonschwartz
+# https://0xfede.io
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import numpy as np
+from . import NetOp, dtype
+from .kernels import sigmoid
+
+"""Recurrent operators.
+
+Each operator processes a whole sequence of shape (time, batch, features) in a single node:
+The input projection for all time steps is computed with one matrix multiplication up front,
+and only the recurrent part is computed step by step, both in the forward and backprop passes.
+Gradients for the input weights and bias are likewise computed with one matrix multiplication
+over all time steps.
+
+All operators take the following parameters, where G is the number of gates of the cell:
+. wx: NetVar: size (features, G*hidden): input weights.
+. wh: NetVar: size (hidden, G*hidden): recurrent weights.
+. b: NetVar: size (1, G*hidden): bias.
+
+The initial hidden (and cell) state is 0.
+"""
+
+
+class _Recurrent(NetOp):
+    """Base class for recurrent operators.
+
+    Subclasses implement _forward and _backward, which run the recurrence over all time steps.
+    """
+    __slots__ = ()
+
+    def __init__(self, x, wx, wh, b, sequences=True):
+        """
+        :param x: NetVar: size (time, batch, features): input sequence.
+        :param wx: NetVar: input weights.
+        :param wh: NetVar: recurrent weights.
+        :param b: NetVar: bias.
+        :param sequences: if True, the output is the hidden state at every time step, of
+        size (time, batch, hidden). Otherwise it is only the last hidden state, of size (batch, hidden).
+        """
+        t, bSize, f = x.data.shape
+        hSize = wh.data.shape[0]
+
+        # Input projection for all time steps. Subclasses overwrite this in place with gate activations:
+        gates = (x.data.reshape(t * bSize, f) @ wx.data + b.data).reshape(t, bSize, -1)
+
+        # h[0] is the initial state:
+        h = np.zeros((t + 1, bSize, hSize), dtype)
+        extra = self._forward(gates, h, wh.data)
+
+        super().__init__(
+            h[1:] if sequences else h[-1],
+            x, wx, wh, b
+        )
+
+        self.cache = sequences, gates, h, extra
+
+    def _back(self, x, wx, wh, b):
+        sequences, gates, h, extra = self.cache
+        t, bSize, f = x.data.shape
+
+        # Gradient w.r.t. the output, for each time step:
+        if sequences:
+            gOut = self.g
+        else:
+            gOut = np.zeros_like(h[1:])
+            gOut[-1] = self.g
+
+        # Gradient w.r.t. the input projection (i.e.: gate pre-activations) for all time steps:
+        dGates = np.empty_like(gates)
+        self._backward(gOut, dGates, gates, h, extra, wh)
+
+        dGates = dGates.reshape(t * bSize, -1)
+        x.g += (dGates @ wx.data.T).reshape(x.data.shape)
+        wx.g += x.data.reshape(t * bSize, f).T @ dGates
+        b.g += np.sum(dGates, axis=0)
+        super()._back()
+
+    def _forward(self, gates, h, wh):
+        # Run the recurrence, overwriting gates with activations and filling h[1:].
+        # Return any additional data required by _backward.
+        #
+        # Subclasses must override this method to implement a specific cell.
+        return None
+
+    def _backward(self, gOut, dGates, gates, h, extra, wh):
+        # Run backprop through time, filling dGates and updating wh.g.
+        #
+        # Subclasses must override this method, along with _forward.
+        pass
+
+
+class RNNCell(_Recurrent):
+    """Vanilla (Elman) recurrent cell.
+
+    h_t = tanh(x_t wx + h_t-1 wh + b)
+    """
+    __slots__ = ()
+
+    def _forward(self, gates, h, wh):
+        for t in range(len(gates)):
+            a = gates[t]
+            a += h[t] @ wh
+            np.tanh(a, out=h[t + 1])
+
+    def _backward(self, gOut, dGates, gates, h, extra, wh):
+        dh = np.zeros_like(h[0])
+
+        for t in reversed(range(len(gates))):
+            dh += gOut[t]
+            da = dGates[t]
+            np.multiply(h[t + 1], h[t + 1], out=da)
+            np.subtract(1., da, out=da)
+            da *= dh
+            np.matmul(da, wh.data.T, out=dh)
+
+        wh.g += h[:-1].reshape(-1, h.shape[2]).T @ dGates.reshape(-1, dGates.shape[2])
+
+
+class LSTM(_Recurrent):
+    """Long short-term memory cell.
+
+    i, f, o = σ(x_t wx + h_t-1 wh + b)[:3H]
+    g = tanh(x_t wx + h_t-1 wh + b)[3H:]
+    c_t = f * c_t-1 + i * g
+    h_t = o * tanh(c_t)
+
+    Where:
+    . H: hidden size. Gates are laid out in wx, wh and b in the order i, f, o, g.
+    """
+    __slots__ = ()
+
+    def _forward(self, gates, h, wh):
+        n = h.shape[2]
+        c = np.zeros_like(h)
+        cTanh = np.empty_like(h[1:])
+
+        for t in range(len(gates)):
+            a = gates[t]
+            a += h[t] @ wh
+            sigmoid(a[:, :3 * n], out=a[:, :3 * n])
+            np.tanh(a[:, 3 * n:], out=a[:, 3 * n:])
+            i, f, o, g = a[:, :n], a[:, n:2 * n], a[:, 2 * n:3 * n], a[:, 3 * n:]
+
+            np.multiply(f, c[t], out=c[t + 1])
+            c[t + 1] += i * g
+            np.tanh(c[t + 1], out=cTanh[t])
+            np.multiply(o, cTanh[t], out=h[t + 1])
+
+        return c, cTanh
+
+    def _backward(self, gOut, dGates, gates, h, extra, wh):
+        c, cTanh = extra
+        n = h.shape[2]
+        dh, dc = np.zeros_like(h[0]), np.zeros_like(h[0])
+
+        for t in reversed(range(len(gates))):
+            a, da = gates[t], dGates[t]
+            i, f, o, g = a[:, :n], a[:, n:2 * n], a[:, 2 * n:3 * n], a[:, 3 * n:]
+            dh += gOut[t]
+
+            dc += dh * o * (1. - cTanh[t] ** 2)
+            np.multiply(dc, g, out=da[:, :n])
+            np.multiply(dc, c[t], out=da[:, n:2 * n])
+            np.multiply(dh, cTanh[t], out=da[:, 2 * n:3 * n])
+            np.multiply(dc, i, out=da[:, 3 * n:])
+            dc *= f
+
+            # Through the activations:
+            da[:, :3 * n] *= a[:, :3 * n] * (1. - a[:, :3 * n])
+            da[:, 3 * n:] *= 1. - g ** 2
+            np.matmul(da, wh.data.T, out=dh)
+
+        wh.g += h[:-1].reshape(-1, n).T @ dGates.reshape(-1, 4 * n)
+
+
+class GRU(_Recurrent):
+    """Gated recurrent unit.
+
+    z, r = σ(x_t wx + h_t-1 wh + b)[:2H]
+    n = tanh(x_t wx[2H:] + (r * h_t-1) wh[2H:] + b[2H:])
+    h_t = (1 - z) * n + z * h_t-1
+
+    Where:
+    . H: hidden size. Gates are laid out in wx, wh and b in the order z, r, n.
+    """
+    __slots__ = ()
+
+    def _forward(self, gates, h, wh):
+        n = h.shape[2]
+        rh = np.empty_like(h[1:])
+
+        for t in range(len(gates)):
+            a = gates[t]
+            a[:, :2 * n] += h[t] @ wh[:, :2 * n]
+            sigmoid(a[:, :2 * n], out=a[:, :2 * n])
+            z, r = a[:, :n], a[:, n:2 * n]
+
+            np.multiply(r, h[t], out=rh[t])
+            a[:, 2 * n:] += rh[t] @ wh[:, 2 * n:]
+            np.tanh(a[:, 2 * n:], out=a[:, 2 * n:])
+
+            # h_t = n + z * (h_t-1 - n):
+            np.subtract(h[t], a[:, 2 * n:], out=h[t + 1])
+            h[t + 1] *= z
+            h[t + 1] += a[:, 2 * n:]
+
+        return rh
+
+    def _backward(self, gOut, dGates, gates, h, extra, wh):
+        rh = extra
+        n = h.shape[2]
+        whZR, whN = wh.data[:, :2 * n], wh.data[:, 2 * n:]
+        dh = np.zeros_like(h[0])
+
+        for t in reversed(range(len(gates))):
+            a, da = gates[t], dGates[t]
+            z, r, g = a[:, :n], a[:, n:2 * n], a[:, 2 * n:]
+            dh += gOut[t]
+
+            np.multiply(dh, h[t] - g, out=da[:, :n])
+            np.multiply(dh, 1. - z, out=da[:, 2 * n:])
+            da[:, 2 * n:] *= 1. - g ** 2
+            dRH = da[:, 2 * n:] @ whN.T
+            np.multiply(dRH, h[t], out=da[:, n:2 * n])
+            da[:, :2 * n] *= a[:, :2 * n] * (1. - a[:, :2 * n])
+
+            dh *= z
+            dh += dRH * r
+            dh += da[:, :2 * n] @ whZR.T
+
+        hPrev, dGates = h[:-1].reshape(-1, n), dGates.reshape(-1, 3 * n)
+        wh.g[:, :2 * n] += hPrev.T @ dGates[:, :2 * n]
+        wh.g[:, 2 * n:] += rh.reshape(-1, n).T @ dGates[:, 2 * n:]
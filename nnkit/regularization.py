@@ -24,7 +24,8 @@
 # SOFTWARE.
 
 import numpy as np
-from . import NetOp
+from . import NetOp, RowSparse, generator
+from .kernels import buffer
 
 
 class L2Reg(NetOp):
@@ -38,7 +39,12 @@ class L2Reg(NetOp):
     . B: batch size.
 
     This node should be appended after a loss node during training.
+
+    Optimizers can instead apply decoupled weight decay (see Optimizer.weightDecay),
+    which avoids this node and its extra passes over all parameters.
     """
+    __slots__ = ()
+
     def __init__(self, l, params, r, t):
         """
         :param l: NetVar: loss from forward pass.
@@ -47,7 +53,7 @@ class L2Reg(NetOp):
         :param t: targets, to infer batch size.
         """
         b = len(t.data)
-        norms = np.hstack([np.linalg.norm(p, ord='fro') ** 2 for p in params])
+        norms = [np.vdot(p.data, p.data) for p in params]
 
         super().__init__(
             l.data + (r / (2*b)) * np.sum(norms),
@@ -61,6 +67,10 @@ class L2Reg(NetOp):
         l.g += self.g
 
         for p in params:
+            if isinstance(p.g, RowSparse):
+                # The penalty touches every row:
+                p.g = p.g.toarray()
+
             p.g += r * p.data / b
 
         super()._back()
@@ -77,22 +87,40 @@ class Dropout(NetOp):
 
     This node should be removed (or k set to 1.) when not training.
     """
-    def __init__(self, x, k=0.8):
+    __slots__ = ()
+
+    def __init__(self, x, k=0.8, rng=None):
         """
         :param x: NetVar: input.
         :param k: [0-1] probability that a unit will NOT be masked.
+        :param rng: optional np.random.Generator to draw the mask from. Defaults to the
+        generator of the network being evaluated (see FFN.rng).
         """
-        dropout = np.random.rand(*x.data.shape) < k
+        if k >= 1.:
+            super().__init__(x.data, x)
+            return
+
+        rng = rng or generator()
+        u = rng.random(x.data.shape, dtype=np.float32, out=buffer('u', x.data.shape, type=np.float32))
+        mask = u < k
+
+        # x/k where not masked, 0 elsewhere, in one pass:
+        y = np.zeros_like(x.data)
+        np.multiply(x.data, 1. / k, out=y, where=mask)
+
         super().__init__(
-            x.data * dropout / k,
+            y,
             x
         )
 
-        self.cache = dropout
+        self.cache = mask, k
 
     def _back(self, x):
-        dropout = self.cache
-        x.g += self.g * dropout
-        super()._back()
-
+        if self.cache is None:
+            x.g += self.g
+        else:
+            mask, k = self.cache
+            g = np.multiply(self.g, 1. / k, out=buffer('t', self.g.shape))
+            np.add(x.g, g, out=x.g, where=mask)
 
+        super()._back()
@@ -24,10 +24,48 @@
 # SOFTWARE.
 
 from . import *
+import numpy as np
 import json as jsn
+import base64
 import gzip
 
 
+def _encode(arg):
+    # NetVars are stored as lists. Other numpy arrays (i.e. int8 quantized weights) as raw bytes,
+    # and CSR matrices as their component arrays:
+    if type(arg) is NetVar:
+        return arg.data.tolist()
+
+    if isinstance(arg, CSR):
+        return {
+            'csr': [_encode(a) for a in (arg.data, arg.indices, arg.indptr)],
+            'shape': arg.shape
+        }
+
+    if isinstance(arg, np.ndarray):
+        return {
+            'ndarray': base64.b64encode(np.ascontiguousarray(arg).tobytes()).decode('ascii'),
+            'dtype': arg.dtype.str,
+            'shape': arg.shape
+        }
+
+    return arg
+
+
+def _decode(arg):
+    if type(arg) is list:
+        return NetVar(arg)
+
+    if type(arg) is dict and 'csr' in arg:
+        return CSR(*[_decode(a) for a in arg['csr']], arg['shape'])
+
+    if type(arg) is dict and 'ndarray' in arg:
+        data = np.frombuffer(base64.b64decode(arg['ndarray']), dtype=arg['dtype'])
+        return data.reshape(arg['shape']).copy()
+
+    return arg
+
+
 def save(topology, path):
     """Save topology (list of tuples) to a gziped json file."""
     json = []
@@ -35,10 +73,7 @@ def save(topology, path):
     for n in topology:
         json.append({
             'op': n[0].__name__,
-            'args': [
-                (n.data.tolist() if type(n) is NetVar else n)
-                for n in n[1:]
-            ]
+            'args': [_encode(n) for n in n[1:]]
         })
 
     with gzip.open(path + '.model.gz', 'wb') as file:
@@ -52,10 +87,7 @@ def load(path):
         json = jsn.load(file)
         topology = [(
             eval(d['op']),
-            *[
-                (NetVar(v) if type(v) is list else v)
-                for v in d['args']
-            ]
+            *[_decode(v) for v in d['args']]
         )
 
             for d in json
@@ -0,0 +1,129 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2018 Federico Saldarini
+# https://www.linkedin.com/in/federicosaldarini
+# https://github.com/saldavonschwartz
+# https://0xfede.io
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import numpy as np
+from . import dtype
+
+
+class CSR:
+    """Compressed sparse row matrix.
+
+    A minimal 2D sparse matrix container, with just the operations the framework needs.
+
+    A CSR matrix can be the value of a NetVar, i.e. as input to a Multiply node for high dimensional
+    inputs with few nonzero features (bag of words, hashed features, etc.), in which case the
+    product and the gradient w.r.t. the weights take time proportional to the number of nonzeros.
+    Batches can be sliced from a CSR dataset by row (i.e.: x[i:i+b] or x[indices]).
+
+    Attributes:
+    . data: nonzero values, ordered by row.
+    . indices: column index of each value in data.
+    . indptr: values in row i are data[indptr[i]:indptr[i+1]].
+    . shape: (rows, columns).
+    """
+    __slots__ = ('data', 'indices', 'indptr', 'shape')
+
+    def __init__(self, data, indices, indptr, shape):
+        self.data = np.asarray(data, dtype)
+        self.indices = np.asarray(indices, np.intp)
+        self.indptr = np.asarray(indptr, np.intp)
+        self.shape = tuple(shape)
+
+    @classmethod
+    def fromDense(cls, a):
+        """Create a CSR matrix from the nonzero values of a dense 2D array."""
+        a = np.asarray(a)
+        rows, cols = np.nonzero(a)
+        indptr = np.zeros(a.shape[0] + 1, np.intp)
+        np.cumsum(np.bincount(rows, minlength=a.shape[0]), out=indptr[1:])
+        return cls(a[rows, cols], cols, indptr, a.shape)
+
+    def toDense(self):
+        """Return the dense equivalent of this matrix."""
+        a = np.zeros(self.shape, dtype)
+        a[self.rows(), self.indices] = self.data
+        return a
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, rows):
+        """Select rows by slice, integer array or boolean mask, as a new CSR matrix."""
+        if isinstance(rows, slice):
+            rows = np.arange(*rows.indices(self.shape[0]))
+        else:
+            rows = np.asarray(rows)
+            rows = np.flatnonzero(rows) if rows.dtype == bool else rows.astype(np.intp, copy=False)
+
+        starts, lengths = self.indptr[rows], np.diff(self.indptr)[rows]
+        indptr = np.zeros(len(rows) + 1, np.intp)
+        np.cumsum(lengths, out=indptr[1:])
+
+        # Positions in data of each value in the selected rows:
+        positions = np.repeat(starts - indptr[:-1], lengths) + np.arange(indptr[-1])
+        return type(self)(self.data[positions], self.indices[positions], indptr, (len(rows), self.shape[1]))
+
+    def __matmul__(self, b):
+        return self.dot(b)
+
+    @property
+    def T(self):
+        """The transpose of this matrix (see transpose)."""
+        return self.transpose()
+
+    @property
+    def nnz(self):
+        """Number of stored values."""
+        return len(self.data)
+
+    def rows(self):
+        """Return the row index of each value in data."""
+        return np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+
+    def transpose(self):
+        """Return the transpose of this matrix, as a CSR matrix."""
+        order = np.argsort(self.indices, kind='stable')
+        indptr = np.zeros(self.shape[1] + 1, np.intp)
+        np.cumsum(np.bincount(self.indices, minlength=self.shape[1]), out=indptr[1:])
+        return type(self)(self.data[order], self.rows()[order], indptr, self.shape[::-1])
+
+    def dot(self, b):
+        """Multiply this matrix by a dense 2D array, in time proportional to the number of stored values.
+
+        :param b: array of size (columns, n).
+
+        :return: array of size (rows, n).
+        """
+        y = np.zeros((self.shape[0], b.shape[1]), np.result_type(self.data, b))
+        if not self.nnz:
+            return y
+
+        # Products of each stored value by its row in b, summed over each row of this matrix.
+        # Empty rows are skipped since reduceat can't express them:
+        products = b[self.indices]
+        products *= self.data[:, None]
+        nonEmpty = self.indptr[1:] > self.indptr[:-1]
+        y[nonEmpty] = np.add.reduceat(products, self.indptr[:-1][nonEmpty], axis=0)
+        return y
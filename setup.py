@@ -8,7 +8,7 @@ with open(path.join(root, 'README.rst'), encoding='utf-8') as readme:
 
 setup(
     name='nnkit',
-    version='1.4.2',
+    version='1.5.0',
     description='NNKit: A Python framework for creating dynamic neural networks.',
     long_description=long_description,
     long_description_content_type='text/markdown',
@@ -18,7 +18,7 @@ setup(
     author_email='fede@0xfede.io',
     license='MIT',
     packages=['nnkit'],
-    install_requires=['numpy'],
+    install_requires=['numpy>=1.25'],
     zip_safe=False
 )
 